@@ -0,0 +1,78 @@
+"""
+Shared helpers for the AWS cleanup scripts in this directory.
+
+Provides the shared boto3 session/client setup and the on-disk cache of
+AWS region names. Scripts import this module directly; their directory
+is on sys.path when they are run.
+"""
+
+import boto3
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from botocore.client import Config
+
+# Large connection pool so concurrent workers don't queue on urllib3, plus
+# adaptive retries to back off client-side when AWS throttles
+BOTO_CONFIG = Config(max_pool_connections=64, retries={'max_attempts': 10, 'mode': 'adaptive'})
+
+# Worker count for mutating calls (deletes/releases). Kept small so that,
+# together with BOTO_CONFIG's adaptive retries, bulk deletes stay under
+# EC2's request rate limits while still running in parallel.
+DELETE_WORKERS = 4
+
+# One session is shared for the whole run. Clients built from it are
+# thread-safe, but building them is not, so creation is serialized.
+_session_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def get_session():
+    """Return the shared boto3 session for the automation profile"""
+    return boto3.Session(profile_name='script-automation-user')
+
+@functools.lru_cache(maxsize=None)
+def get_client(service_name, region_name='us-east-1'):
+    """Return a client for a service and region, shared by all threads"""
+    with _session_lock:
+        return get_session().client(service_name, region_name=region_name, config=BOTO_CONFIG)
+
+REGION_CACHE_PATH = os.path.expanduser('~/.cache/aws-cleanup-regions.json')
+REGION_CACHE_TTL = 7 * 24 * 60 * 60  # 7 days
+
+def get_regions_cached():
+    """
+    Return all AWS region names, cached on disk for REGION_CACHE_TTL seconds.
+    
+    The region list is effectively static, so DescribeRegions is only
+    called when the cache file is missing, unreadable or stale.
+    """
+    try:
+        with open(REGION_CACHE_PATH) as f:
+            cache = json.load(f)
+        if time.time() - cache['timestamp'] < REGION_CACHE_TTL:
+            return cache['regions']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    
+    ec2_client = get_client('ec2', 'us-east-1')
+    regions = [region['RegionName'] for region in ec2_client.describe_regions()['Regions']]
+    
+    # Write to a temp file and rename so readers never see a partial cache
+    cache_dir = os.path.dirname(REGION_CACHE_PATH)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'timestamp': time.time(), 'regions': regions}, f)
+            os.replace(tmp_path, REGION_CACHE_PATH)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        print(f"Warning: could not write region cache {REGION_CACHE_PATH}: {e}")
+    
+    return regions
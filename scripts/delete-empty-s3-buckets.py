@@ -5,8 +5,150 @@ Finds and deletes empty S3 buckets with versioning disabled.
 WARNING: Bucket deletion is permanent and irreversible!
 """
 
-import boto3
 import sys
+from botocore.exceptions import BotoCoreError, ClientError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from aws_common import get_client
+
+# GetMetricData accepts at most 500 queries per request
+CLOUDWATCH_BATCH_SIZE = 500
+
+def get_bucket_region(bucket_name, region_name='us-east-1'):
+    """
+    Find a bucket's region with a single HeadBucket call.
+    
+    S3 returns the x-amz-bucket-region header on HeadBucket responses,
+    including redirect and access-denied errors, so the region is known
+    even when the call itself fails.
+    """
+    try:
+        response = get_client('s3', region_name).head_bucket(Bucket=bucket_name)
+    except ClientError as e:
+        response = e.response
+        if 'x-amz-bucket-region' not in response['ResponseMetadata'].get('HTTPHeaders', {}):
+            raise
+    return response['ResponseMetadata']['HTTPHeaders']['x-amz-bucket-region']
+
+def get_bucket_object_counts(bucket_names, region_name='us-east-1'):
+    """
+    Look up the latest daily NumberOfObjects metric for buckets in a region.
+    
+    S3 publishes storage metrics to CloudWatch in the bucket's own region,
+    once per day. Returns (object_counts, errors): a dict of bucket name ->
+    object count, and one error message per failed batch. Buckets without
+    a recent datapoint (e.g. created today) or in a failed batch are left
+    out, so only those fall back to listing.
+    """
+    cloudwatch = get_client('cloudwatch', region_name)
+    paginator = cloudwatch.get_paginator('get_metric_data')
+    
+    end_time = datetime.now(timezone.utc)
+    start_time = end_time - timedelta(days=3)
+    object_counts = {}
+    errors = []
+    
+    for offset in range(0, len(bucket_names), CLOUDWATCH_BATCH_SIZE):
+        batch = bucket_names[offset:offset + CLOUDWATCH_BATCH_SIZE]
+        queries = [
+            {
+                'Id': f'b{index}',
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/S3',
+                        'MetricName': 'NumberOfObjects',
+                        'Dimensions': [
+                            {'Name': 'BucketName', 'Value': bucket_name},
+                            {'Name': 'StorageType', 'Value': 'AllStorageTypes'}
+                        ]
+                    },
+                    'Period': 86400,
+                    'Stat': 'Average'
+                }
+            }
+            for index, bucket_name in enumerate(batch)
+        ]
+        
+        # Counts are only kept once a whole batch succeeds, so a failure
+        # partway through paging can't leave some of its buckets half-read
+        batch_counts = {}
+        try:
+            pages = paginator.paginate(
+                MetricDataQueries=queries,
+                StartTime=start_time,
+                EndTime=end_time,
+                ScanBy='TimestampDescending'
+            )
+            for page in pages:
+                for result in page['MetricDataResults']:
+                    # Newest datapoint comes first; keep only that one
+                    if result['Values']:
+                        bucket_name = batch[int(result['Id'][1:])]
+                        batch_counts.setdefault(bucket_name, result['Values'][0])
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        object_counts.update(batch_counts)
+    
+    return object_counts, errors
+
+def submit_bucket_checks(executor, bucket_name, region_name='us-east-1'):
+    """
+    Start the emptiness and versioning lookups for a bucket.
+    
+    The two calls are independent, so they are submitted together and
+    overlap instead of costing two sequential round-trips. Both go to the
+    bucket's own regional endpoint.
+    """
+    s3_client = get_client('s3', region_name)
+    return (
+        executor.submit(s3_client.list_objects_v2, Bucket=bucket_name, MaxKeys=1),
+        executor.submit(s3_client.get_bucket_versioning, Bucket=bucket_name),
+    )
+
+def check_one_bucket(bucket, bucket_region, checks):
+    """
+    Evaluate the lookups started by submit_bucket_checks for one bucket.
+    
+    Returns the list_buckets entry, annotated with its 'Region', if the
+    bucket is empty and versioning is not enabled, otherwise None.
+    """
+    list_future, versioning_future = checks
+    bucket_name = bucket['Name']
+    
+    try:
+        # Check if bucket is empty
+        list_response = list_future.result()
+        
+        # 'Contents' key exists only if there are objects
+        if 'Contents' in list_response:
+            return None
+        
+        # Check if versioning is enabled
+        versioning_response = versioning_future.result()
+        versioning_status = versioning_response.get('Status', 'Suspended')
+        
+        # Only proceed if versioning is NOT enabled
+        if versioning_status == 'Enabled':
+            return None
+        
+        # Optional: Check for website configuration
+        # try:
+        #     get_client('s3', bucket_region).get_bucket_website(Bucket=bucket_name)
+        #     print(f"  Skipping {bucket_name} - has website configuration")
+        #     return None
+        # except:
+        #     pass
+        
+        # Reuse the list_buckets entry rather than copying it; CreationDate
+        # stays a datetime and is only formatted when the report prints it
+        bucket['Region'] = bucket_region
+        return bucket
+        
+    except Exception as e:
+        print(f"  Error checking bucket {bucket_name}: {e}")
+        return None
 
 def get_empty_buckets(region_name='us-east-1'):
     """
@@ -16,57 +158,70 @@ def get_empty_buckets(region_name='us-east-1'):
     1. Bucket has zero objects (empty)
     2. Bucket versioning is NOT enabled
     3. Bucket is not configured for static website hosting
+    
+    CloudWatch's NumberOfObjects metric is used to rule out non-empty
+    buckets in bulk; only buckets it reports as empty (or has no data
+    for) are confirmed with list_objects_v2.
     """
-    session = boto3.Session(profile_name='script-automation-user', region_name=region_name)
-    s3_client = session.client('s3')
+    s3_client = get_client('s3', region_name)
     
     try:
         # List all buckets (S3 is global, but buckets have regions)
         response = s3_client.list_buckets()
-        empty_buckets = []
+        buckets = response['Buckets']
         
-        for bucket in response['Buckets']:
-            bucket_name = bucket['Name']
-            
+    except Exception as e:
+        print(f"Error listing buckets: {e}")
+        return []
+    
+    # The pool size bounds how many requests are in flight at once
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        # Get bucket regions; metrics live in each bucket's region
+        region_futures = [
+            (bucket, executor.submit(get_bucket_region, bucket['Name'], region_name))
+            for bucket in buckets
+        ]
+        bucket_regions = {}
+        for bucket, future in region_futures:
             try:
-                # Get bucket location/region
-                location_response = s3_client.get_bucket_location(Bucket=bucket_name)
-                bucket_region = location_response.get('LocationConstraint', 'us-east-1')
-                
-                # Check if bucket is empty
-                list_response = s3_client.list_objects_v2(Bucket=bucket_name, MaxKeys=1)
-                
-                # 'Contents' key exists only if there are objects
-                if 'Contents' not in list_response:
-                    # Check if versioning is enabled
-                    versioning_response = s3_client.get_bucket_versioning(Bucket=bucket_name)
-                    versioning_status = versioning_response.get('Status', 'Suspended')
-                    
-                    # Only proceed if versioning is NOT enabled
-                    if versioning_status != 'Enabled':
-                        # Optional: Check for website configuration
-                        # try:
-                        #     s3_client.get_bucket_website(Bucket=bucket_name)
-                        #     print(f"  Skipping {bucket_name} - has website configuration")
-                        #     continue
-                        # except:
-                        #     pass
-                        
-                        empty_buckets.append({
-                            'Name': bucket_name,
-                            'Region': bucket_region if bucket_region else 'us-east-1',
-                            'CreationDate': bucket['CreationDate']
-                        })
-                        
+                bucket_regions[bucket['Name']] = future.result()
             except Exception as e:
-                print(f"  Error checking bucket {bucket_name}: {e}")
-                continue
+                print(f"  Error checking bucket {bucket['Name']}: {e}")
         
-        return empty_buckets
+        names_by_region = {}
+        for bucket_name, bucket_region in bucket_regions.items():
+            names_by_region.setdefault(bucket_region, []).append(bucket_name)
         
-    except Exception as e:
-        print(f"Error listing buckets: {e}")
-        return []
+        object_counts = {}
+        count_futures = [
+            (bucket_region, executor.submit(get_bucket_object_counts, bucket_names, bucket_region))
+            for bucket_region, bucket_names in names_by_region.items()
+        ]
+        for bucket_region, future in count_futures:
+            try:
+                region_counts, errors = future.result()
+            except Exception as e:
+                errors = [e]
+            else:
+                object_counts.update(region_counts)
+            for error in errors:
+                print(f"  Error reading S3 metrics in {bucket_region}, falling back to listing: {error}")
+        
+        # Skip buckets CloudWatch already reports as holding objects
+        candidates = [
+            bucket for bucket in buckets
+            if bucket['Name'] in bucket_regions and not object_counts.get(bucket['Name'])
+        ]
+        pending = [
+            (bucket, submit_bucket_checks(executor, bucket['Name'], bucket_regions[bucket['Name']]))
+            for bucket in candidates
+        ]
+        results = [
+            check_one_bucket(bucket, bucket_regions[bucket['Name']], checks)
+            for bucket, checks in pending
+        ]
+    
+    return [bucket_info for bucket_info in results if bucket_info is not None]
 
 def delete_buckets(bucket_list, dry_run=True):
     """
@@ -80,38 +235,42 @@ def delete_buckets(bucket_list, dry_run=True):
         print("No buckets to delete")
         return
     
+    if dry_run:
+        lines = []
+        for bucket_info in bucket_list:
+            bucket_name = bucket_info['Name']
+            bucket_region = bucket_info['Region']
+            lines.append(f"[DRY RUN] Would delete empty bucket: {bucket_name} (Region: {bucket_region})")
+        sys.stdout.write("\n".join(lines) + "\n")
+        return
+    
     deleted_count = 0
     
     for bucket_info in bucket_list:
         bucket_name = bucket_info['Name']
         bucket_region = bucket_info['Region']
         
-        # Create session for bucket's region
-        session = boto3.Session(
-            profile_name='script-automation-user',
-            region_name=bucket_region
-        )
-        s3_client = session.client('s3')
-        
-        if dry_run:
-            print(f"[DRY RUN] Would delete empty bucket: {bucket_name} (Region: {bucket_region})")
-        else:
-            try:
-                # Double-check it's still empty before deleting
-                list_response = s3_client.list_objects_v2(Bucket=bucket_name, MaxKeys=1)
-                if 'Contents' in list_response:
-                    print(f"  WARNING: {bucket_name} now has objects, skipping")
-                    continue
-                
-                s3_client.delete_bucket(Bucket=bucket_name)
-                print(f"Deleted empty bucket: {bucket_name} (Region: {bucket_region})")
-                deleted_count += 1
-                
-            except Exception as e:
-                print(f"Failed to delete bucket {bucket_name}: {e}")
+        try:
+            # Reuse one client per bucket region
+            s3_client = get_client('s3', bucket_region)
+            
+            # S3 refuses to delete a bucket that has gained objects since
+            # the scan, so no separate emptiness check is needed
+            s3_client.delete_bucket(Bucket=bucket_name)
+            print(f"Deleted empty bucket: {bucket_name} (Region: {bucket_region})", flush=True)
+            deleted_count += 1
+            
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'BucketNotEmpty':
+                print(f"  WARNING: {bucket_name} now has objects, skipping", flush=True)
+            else:
+                print(f"Failed to delete bucket {bucket_name}: {e}", flush=True)
+        except BotoCoreError as e:
+            # Transport failures (timeouts, retries exhausted) only skip
+            # this bucket; the rest of the batch still runs
+            print(f"Failed to delete bucket {bucket_name}: {e}", flush=True)
     
-    if not dry_run:
-        print(f"\nSuccessfully deleted {deleted_count} empty bucket(s)")
+    print(f"\nSuccessfully deleted {deleted_count} empty bucket(s)", flush=True)
 
 def main():
     """Main function to find and delete empty S3 buckets"""
@@ -120,31 +279,34 @@ def main():
     print("=" * 70)
     print("WARNING: Bucket deletion is PERMANENT and IRREVERSIBLE!")
     print("Deleted bucket names become available for anyone to claim.")
-    print("=" * 70)
+    print("=" * 70, flush=True)
     
     # For S3, we typically use us-east-1 as the default region for API calls
     # Buckets themselves have their own regions
     empty_buckets = get_empty_buckets(region_name='us-east-1')
     
     if empty_buckets:
-        print(f"\nFound {len(empty_buckets)} empty bucket(s) with versioning disabled:")
-        print("-" * 50)
+        # Build the findings report and write it once, before any deletes
+        lines = [f"\nFound {len(empty_buckets)} empty bucket(s) with versioning disabled:", "-" * 50]
         
         for bucket in empty_buckets:
-            print(f"• {bucket['Name']}")
-            print(f"  Region: {bucket['Region']}")
-            print(f"  Created: {bucket['CreationDate'].strftime('%Y-%m-%d')}")
-            print()
+            lines.append(f"• {bucket['Name']}")
+            lines.append(f"  Region: {bucket['Region']}")
+            lines.append(f"  Created: {bucket['CreationDate'].strftime('%Y-%m-%d')}")
+            lines.append("")
         
         # Show summary
-        print("-" * 50)
-        print(f"Total empty buckets found: {len(empty_buckets)}")
+        lines.append("-" * 50)
+        lines.append(f"Total empty buckets found: {len(empty_buckets)}")
         
         # Always run in dry-run mode first
-        print("\n" + "!" * 50)
-        print("RUNNING IN DRY-RUN MODE - NO BUCKETS WILL BE DELETED")
-        print("To actually delete, change dry_run=False in delete_buckets() call")
-        print("!" * 50)
+        lines.append("\n" + "!" * 50)
+        lines.append("RUNNING IN DRY-RUN MODE - NO BUCKETS WILL BE DELETED")
+        lines.append("To actually delete, change dry_run=False in delete_buckets() call")
+        lines.append("!" * 50)
+        
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
         
         delete_buckets(empty_buckets, dry_run=True)
         
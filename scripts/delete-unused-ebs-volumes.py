@@ -1,45 +1,89 @@
-import boto3
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from aws_common import DELETE_WORKERS, get_client, get_regions_cached
 
 def get_unused_volumes(region_name='us-east-1'):
-    # Create a session for a specific profile and region
-    session = boto3.Session(profile_name='script-automation-user', region_name=region_name)
-    ec2 = session.resource('ec2')
+    # Low-level client: pages come back as plain dicts, without wrapping
+    # every volume in a resource object
+    ec2 = get_client('ec2', region_name)
+    paginator = ec2.get_paginator('describe_volumes')
     unused_volumes = []
-    for volume in ec2.volumes.all():
-        if volume.state == 'available':
-            attachments = volume.attachments
-            if not attachments:
-                volume_id = volume.id.replace('\u00A0', ' ')
-                unused_volumes.append(volume_id)
+    # Only 'available' volumes are requested, so EC2 filters server-side;
+    # pages use the largest page size EC2 allows
+    pages = paginator.paginate(
+        Filters=[{'Name': 'status', 'Values': ['available']}],
+        PaginationConfig={'PageSize': 1000}
+    )
+    for page in pages:
+        for volume in page['Volumes']:
+            # Available volumes have no attachments; checked as a safety net
+            if not volume['Attachments']:
+                unused_volumes.append(volume['VolumeId'])
     return unused_volumes
 
-def delete_volumes(volumes, region_name='us-east-1'):
-    """Delete specified volumes in a region using secure profile"""
-    session = boto3.Session(profile_name='script-automation-user', region_name=region_name)
-    ec2 = session.resource('ec2')
+def delete_volumes(jobs, dry_run=True):
+    """Delete (region, volume_id) pairs using shared per-region clients"""
+    if dry_run:
+        lines = [
+            f"[DRY RUN] Would delete volume {volume_id} in {region_name}"
+            for region_name, volume_id in jobs
+        ]
+        sys.stdout.write("\n".join(lines) + "\n")
+        return
     
-    for volume in volumes:
-        if dry_run:
-            print(f"[DRY RUN] Would delete volume {volume}")
-        else:
-            print(f"Deleting volume {volume}")
-            ec2.Volume(volume).delete()
+    with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+        futures = {
+            executor.submit(get_client('ec2', region_name).delete_volume, VolumeId=volume_id):
+                (region_name, volume_id)
+            for region_name, volume_id in jobs
+        }
+        
+        # Report each delete as soon as it finishes so the record of what
+        # was removed survives an interrupted run
+        for future in as_completed(futures):
+            region_name, volume_id = futures[future]
+            try:
+                future.result()
+                print(f"Deleted volume {volume_id} in {region_name}", flush=True)
+            except Exception as e:
+                print(f"Failed to delete volume {volume_id} in {region_name}: {e}", flush=True)
 
 def main():
-    initial_session = boto3.Session(profile_name='script-automation-user', region_name='us-east-1')
-    ec2_client = initial_session.client('ec2')
+    regions = get_regions_cached()
     
-    regions = [region['RegionName'] for region in ec2_client.describe_regions()['Regions']]
+    # Scan all regions concurrently from the shared session
+    print(f"Checking for unused volumes in {len(regions)} regions", flush=True)
+    with ThreadPoolExecutor(max_workers=max(1, min(32, len(regions)))) as executor:
+        futures = {region: executor.submit(get_unused_volumes, region) for region in regions}
     
-    for region in regions:
-        print(f"Checking for unused volumes in region {region}")
-        unused_volumes = get_unused_volumes(region_name=region)
-        
-        if unused_volumes:
-            # Add dry_run parameter for safety
-            delete_volumes(unused_volumes, region_name=region, dry_run=True)
-        else:
-            print(f"No unused volumes found in region {region}")
+    # Write the scan findings in one go, in region order; a region that
+    # fails to scan is reported and skipped
+    lines = []
+    results = {}
+    for region, future in futures.items():
+        try:
+            unused_volumes = future.result()
+        except Exception as e:
+            lines.append(f"Error scanning volumes in region {region}: {e}")
+            continue
+        results[region] = unused_volumes
+        if not unused_volumes:
+            lines.append(f"No unused volumes found in region {region}")
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+    
+    # Flatten to (region, volume_id) pairs so deletes in every region
+    # go through one bounded pool
+    jobs = [
+        (region, volume_id)
+        for region, unused_volumes in results.items()
+        for volume_id in unused_volumes
+    ]
+    if jobs:
+        # Add dry_run parameter for safety
+        delete_volumes(jobs, dry_run=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,4 +1,7 @@
-import boto3
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from aws_common import DELETE_WORKERS, get_client, get_regions_cached
 
 def get_unused_elastic_ips(region_name='us-east-1'):
     """
@@ -6,30 +9,27 @@ def get_unused_elastic_ips(region_name='us-east-1'):
     
     Unused EIPs are those allocated to your account but not associated
     with any running instance or network interface.
+    
+    API errors are raised to the caller, so that scans running in worker
+    threads don't print out of order.
     """
-    session = boto3.Session(profile_name='script-automation-user', region_name=region_name)
-    ec2 = session.client('ec2')
+    ec2 = get_client('ec2', region_name)
     
-    try:
-        # Describe all Elastic IPs in the VPC
-        response = ec2.describe_addresses(Filters=[{"Name": "domain", "Values": ["vpc"]}])
-        unused_ips = []
-        
-        for address in response['Addresses']:
-            # If no AssociationId, the EIP is not attached to anything
-            if 'AssociationId' not in address:
-                unused_ips.append({
-                    'PublicIp': address.get('PublicIp', 'Unknown'),
-                    'AllocationId': address['AllocationId'],
-                    'NetworkInterfaceId': address.get('NetworkInterfaceId'),
-                    'PrivateIpAddress': address.get('PrivateIpAddress')
-                })
-        
-        return unused_ips
-        
-    except Exception as e:
-        print(f"Error scanning Elastic IPs in {region_name}: {e}")
-        return []
+    # Describe all Elastic IPs in the VPC
+    response = ec2.describe_addresses(Filters=[{"Name": "domain", "Values": ["vpc"]}])
+    unused_ips = []
+    
+    for address in response['Addresses']:
+        # If no AssociationId, the EIP is not attached to anything
+        if 'AssociationId' not in address:
+            unused_ips.append({
+                'PublicIp': address.get('PublicIp', 'Unknown'),
+                'AllocationId': address['AllocationId'],
+                'NetworkInterfaceId': address.get('NetworkInterfaceId'),
+                'PrivateIpAddress': address.get('PrivateIpAddress')
+            })
+    
+    return unused_ips
 
 def release_elastic_ips(ip_list, region_name='us-east-1', dry_run=True):
     """
@@ -41,35 +41,41 @@ def release_elastic_ips(ip_list, region_name='us-east-1', dry_run=True):
         print(f"No Elastic IPs to release in {region_name}")
         return
     
-    session = boto3.Session(profile_name='script-automation-user', region_name=region_name)
-    ec2 = session.client('ec2')
+    if dry_run:
+        lines = []
+        for ip_info in ip_list:
+            public_ip = ip_info['PublicIp']
+            allocation_id = ip_info['AllocationId']
+            lines.append(f"[DRY RUN] Would release Elastic IP {public_ip} ({allocation_id}) in {region_name}")
+        sys.stdout.write("\n".join(lines) + "\n")
+        return
+    
+    # One client shared by all workers (clients are thread-safe)
+    ec2 = get_client('ec2', region_name)
     
     released_count = 0
-    for ip_info in ip_list:
-        public_ip = ip_info['PublicIp']
-        allocation_id = ip_info['AllocationId']
+    with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+        futures = {
+            executor.submit(ec2.release_address, AllocationId=ip_info['AllocationId']): ip_info
+            for ip_info in ip_list
+        }
         
-        if dry_run:
-            print(f"[DRY RUN] Would release Elastic IP {public_ip} ({allocation_id}) in {region_name}")
-        else:
+        for future in as_completed(futures):
+            public_ip = futures[future]['PublicIp']
+            allocation_id = futures[future]['AllocationId']
             try:
-                ec2.release_address(AllocationId=allocation_id)
-                print(f"Released Elastic IP {public_ip} ({allocation_id}) in {region_name}")
+                future.result()
+                print(f"Released Elastic IP {public_ip} ({allocation_id}) in {region_name}", flush=True)
                 released_count += 1
             except Exception as e:
-                print(f"Failed to release Elastic IP {public_ip}: {e}")
+                print(f"Failed to release Elastic IP {public_ip}: {e}", flush=True)
     
-    if not dry_run:
-        print(f"Successfully released {released_count} Elastic IP(s) in {region_name}")
+    print(f"Successfully released {released_count} Elastic IP(s) in {region_name}", flush=True)
 
 def main():
     """Main function to scan all regions for unused Elastic IPs"""
-    # Get initial session to list regions
-    session = boto3.Session(profile_name='script-automation-user', region_name='us-east-1')
-    ec2_client = session.client('ec2')
-    
-    # Get all AWS regions
-    regions = [region['RegionName'] for region in ec2_client.describe_regions()['Regions']]
+    # Get all AWS regions (cached on disk between runs)
+    regions = get_regions_cached()
     
     print("=" * 60)
     print("Elastic IP Cleanup Script")
@@ -77,24 +83,40 @@ def main():
     print(f"Scanning {len(regions)} AWS regions...")
     print("Note: Running in DRY RUN mode by default (no changes will be made)")
     print("To actually release IPs, change dry_run=False in the release_elastic_ips() call")
-    print("=" * 60)
+    print("=" * 60, flush=True)
     
-    total_unused = 0
+    # Scan all regions concurrently; workers share one session and reuse
+    # the same per-region clients for the release step
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        futures = {region: executor.submit(get_unused_elastic_ips, region) for region in regions}
     
-    for region in regions:
-        print(f"\nChecking region: {region}")
-        unused_ips = get_unused_elastic_ips(region_name=region)
+    # Build the findings report in region order and write it once
+    lines = []
+    unused_by_region = {}
+    for region, future in futures.items():
+        lines.append(f"\nChecking region: {region}")
+        try:
+            unused_ips = future.result()
+        except Exception as e:
+            lines.append(f"Error scanning Elastic IPs in {region}: {e}")
+            continue
         
         if unused_ips:
-            print(f"Found {len(unused_ips)} unused Elastic IP(s) in {region}:")
+            lines.append(f"Found {len(unused_ips)} unused Elastic IP(s) in {region}:")
             for ip_info in unused_ips:
-                print(f"  - {ip_info['PublicIp']} (Private: {ip_info.get('PrivateIpAddress', 'N/A')})")
-            
-            # Release the IPs (with dry_run=True for safety)
-            release_elastic_ips(unused_ips, region_name=region, dry_run=True)
-            total_unused += len(unused_ips)
+                lines.append(f"  - {ip_info['PublicIp']} (Private: {ip_info.get('PrivateIpAddress', 'N/A')})")
+            unused_by_region[region] = unused_ips
         else:
-            print(f"No unused Elastic IPs found in {region}")
+            lines.append(f"No unused Elastic IPs found in {region}")
+    
+    sys.stdout.write("\n".join(lines) + "\n\n")
+    sys.stdout.flush()
+    
+    for region, unused_ips in unused_by_region.items():
+        # Release the IPs (with dry_run=True for safety)
+        release_elastic_ips(unused_ips, region_name=region, dry_run=True)
+    
+    total_unused = sum(len(unused_ips) for unused_ips in unused_by_region.values())
     
     print("\n" + "=" * 60)
     print(f"SCAN COMPLETE: Found {total_unused} total unused Elastic IPs across all regions")